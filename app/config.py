@@ -1,11 +1,20 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
     # MongoDB
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "ecommerce"
+    mongodb_max_pool_size: int = 50
+    mongodb_min_pool_size: int = 50  ## keep the pool warm so bursts never wait on new connections
+    mongodb_max_idle_time_ms: int = 30000
+    mongodb_wait_queue_timeout_ms: int = 2000
+    mongodb_server_selection_timeout_ms: int = 2000
+    mongodb_retry_writes: bool = True
+    mongodb_transactions: bool = False  ## checkout in a transaction; needs a replica set
+    mongodb_text_search: bool = True  ## product search via the $text index; off for backends without one
     
     # JWT
     secret_key: str = "your-secret-key"
@@ -14,12 +23,19 @@ class Settings(BaseSettings):
     
     # Redis
     redis_url: str = "redis://localhost:6379"
+    cache_enabled: bool = True
+    product_cache_ttl_seconds: int = 300
+    products_list_cache_ttl_seconds: int = 60
+    redis_socket_connect_timeout_seconds: float = 0.25  ## fail fast so the cache falls through to MongoDB
+    redis_socket_timeout_seconds: float = 0.25
+    
+    # Rate limiting (defaults to redis_url when unset)
+    rate_limit_storage_url: Optional[str] = None
     
     # App
     debug: bool = True
     
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env")
 
 
 @lru_cache()
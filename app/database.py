@@ -1,3 +1,4 @@
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from app.config import get_settings
@@ -8,19 +9,55 @@ from app.models.product import Product
 from app.models.cart import Cart
 from app.models.order import Order
 
+## one client (and connection pool) shared by the whole process
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Return the process-wide Motor client, creating it on first use."""
+    global _client
+    if _client is None:
+        settings = get_settings()
+        _client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            maxIdleTimeMS=settings.mongodb_max_idle_time_ms,
+            waitQueueTimeoutMS=settings.mongodb_wait_queue_timeout_ms,
+            serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+            retryWrites=settings.mongodb_retry_writes,
+        )
+    return _client
+
+
+def close_db() -> None:
+    """Close the shared Motor client if one was opened."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+async def backfill_name_lower() -> None:
+    """Derive name_lower on products stored before the field existed, so prefix search finds them."""
+    ## the filter matches nothing once every product has the field, so re-running it at startup is cheap
+    await Product.get_motor_collection().update_many(
+        {"name_lower": {"$exists": False}},
+        [{"$set": {"name_lower": {"$toLower": "$name"}}}],
+    )
+
 
 async def init_db():
     """Initialize database connection and Beanie ODM."""
     settings = get_settings()
     
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    
     await init_beanie(
-        database=client[settings.database_name],
+        database=get_client()[settings.database_name],
         document_models=[
             User,
             Product,
             Cart,
             Order,
         ]
-    )
\ No newline at end of file
+    )
+    await backfill_name_lower()
\ No newline at end of file
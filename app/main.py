@@ -1,24 +1,26 @@
+import pydantic
+import pydantic_core
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.database import init_db
-from app.config import get_settings
-from slowapi.middleware import SlowAPIMiddleware
+from app.database import init_db, close_db
+from app.utils.cache import close_redis
 # Import routers
 from app.routers import auth, product, cart, order
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from app.middleware.rate_limiter import limiter
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-limiter = Limiter(key_func=get_remote_address)
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
     # Startup
     await init_db()
     print("✅ Database connected!")
+    print(f"✅ Pydantic {pydantic.VERSION} (compiled core {pydantic_core.__version__})")
     yield
     # Shutdown
+    await close_redis()
+    close_db()
     print("👋 Shutting down...")
 
 
@@ -29,6 +31,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Limits are applied per-route via @limiter.limit; the handler reads app.state.limiter
+app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # Register routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
@@ -1,4 +1,32 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from app.config import get_settings
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+
+def _storage_uri() -> str:
+    """Rate-limit storage URI, read from settings when the limiter is built."""
+    settings = get_settings()
+    return settings.rate_limit_storage_url or settings.redis_url
+
+
+def _storage_options() -> dict:
+    """Socket timeouts for the limiter's Redis client, matching the cache client."""
+    settings = get_settings()
+    return {
+        "socket_connect_timeout": settings.redis_socket_connect_timeout_seconds,
+        "socket_timeout": settings.redis_socket_timeout_seconds,
+    }
+
+
+# Counters live in Redis so limits are shared across workers; the moving-window
+# strategy is evaluated server-side with an atomic Lua script. limits' Redis storage
+# uses the synchronous client, so each limited request makes one blocking round-trip;
+# the short socket timeouts keep a stalled Redis from freezing the event loop.
+# If Redis is unreachable, limits fall back to per-process memory instead of failing auth.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=_storage_uri(),
+    storage_options=_storage_options(),
+    strategy="moving-window",
+    in_memory_fallback_enabled=True,
+)
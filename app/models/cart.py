@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import List
-from beanie import Document, PydanticObjectId
+from beanie import Document, PydanticObjectId, before_event, Replace, Save, SaveChanges
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 
 
 class CartItem(BaseModel):
@@ -18,5 +19,13 @@ class Cart(Document):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+    @before_event(Replace, Save, SaveChanges)
+    def touch_updated_at(self):
+        """Refresh updated_at whenever the document is written back."""
+        self.updated_at = datetime.utcnow()
+
     class Settings:
         name = "carts"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+        ]
@@ -1,8 +1,9 @@
 from datetime import datetime
 from typing import List, Optional
 from enum import Enum
-from beanie import Document, PydanticObjectId
+from beanie import Document, PydanticObjectId, before_event, Replace, Save, SaveChanges
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 
 
 class OrderStatus(str, Enum):
@@ -21,6 +22,17 @@ class OrderItem(BaseModel):
     price: float = Field(gt=0)
 
 
+class OrderSummary(BaseModel):
+    """Order projection for list views (skips the embedded items)."""
+    id: PydanticObjectId = Field(alias="_id")
+    user_id: PydanticObjectId
+    total: float
+    status: OrderStatus
+    shipping_address: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 class Order(Document):
     """Order document model for MongoDB."""
     user_id: PydanticObjectId
@@ -28,8 +40,16 @@ class Order(Document):
     total: float = Field(gt=0)
     status: OrderStatus = OrderStatus.PENDING
     shipping_address: Optional[str] = None
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @before_event(Replace, Save, SaveChanges)
+    def touch_updated_at(self):
+        """Refresh updated_at whenever the document is written back."""
+        self.updated_at = datetime.utcnow()
 
     class Settings:
         name = "orders"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
@@ -1,7 +1,17 @@
 from datetime import datetime
 from typing import Optional, List
-from beanie import Document
-from pydantic import Field
+from beanie import Document, before_event, Replace, Save, SaveChanges
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field, model_validator
+from pymongo import IndexModel, ASCENDING, TEXT
+
+
+class ProductStock(BaseModel):
+    """Product projection for checkout (name, current price and stock)."""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    price: float
+    stock: int
 
 
 class Product(Document):
@@ -13,8 +23,27 @@ class Product(Document):
     category: Optional[str] = None
     tags: List[str] = []
     is_active: bool = True
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    name_lower: Optional[str] = None  ## indexed copy of name for case-insensitive prefix search
+
+    @model_validator(mode="after")
+    def fill_name_lower(self):
+        """Derive name_lower on construction, which also covers insert_many."""
+        self.name_lower = self.name.lower()
+        return self
+
+    @before_event(Replace, Save, SaveChanges)
+    def touch_updated_at(self):
+        """Refresh updated_at (and name_lower) whenever the document is written back."""
+        self.updated_at = datetime.utcnow()
+        self.name_lower = self.name.lower()
 
     class Settings:
         name = "products"
+        indexes = [
+            IndexModel([("name_lower", ASCENDING)]),
+            IndexModel([("name", TEXT), ("description", TEXT)]),  ## word search over both fields
+            IndexModel([("category", ASCENDING)]),
+            IndexModel([("tags", ASCENDING)]),  ## multikey over the tags array
+        ]
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional
-from beanie import Document
-from pydantic import EmailStr
+from beanie import Document, before_event, Replace, Save, SaveChanges
+from pydantic import EmailStr, Field
+from pymongo import IndexModel, ASCENDING
 
 
 class User(Document):
@@ -11,8 +12,16 @@ class User(Document):
     full_name: Optional[str] = None
     is_active: bool = True
     is_superuser: bool = False
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @before_event(Replace, Save, SaveChanges)
+    def touch_updated_at(self):
+        """Refresh updated_at whenever the document is written back."""
+        self.updated_at = datetime.utcnow()
 
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], unique=True),
+        ]
@@ -1,14 +1,13 @@
 ## All endpoints require authentication (user must be logged in)
 from fastapi import APIRouter, Depends, HTTPException
+from beanie import PydanticObjectId
 from app.schemas.cart import CartItemAdd, CartItemUpdate, CartResponse
 from app.services.cart import get_cart, add_to_cart, update_cart_item, remove_from_cart, clear_cart
-from app.routers.auth import  get_current_user
+from app.services.auth import get_current_user
 
 
-## Initialize router
-router = APIRouter(
-    dependencies=[Depends(get_current_user)]
-)
+## Initialize router (every endpoint injects current_user itself)
+router = APIRouter()
 ## Get current user's cart
 @router.get("/", response_model=CartResponse)
 async def read_cart(current_user=Depends(get_current_user)):
@@ -30,7 +29,7 @@ async def add_item_to_cart(
         raise HTTPException(status_code=500, detail=str(e))
 
 ## Update item in cart
-@router.put("/cart/items", response_model=CartResponse) 
+@router.put("/items", response_model=CartResponse)
 async def update_item_in_cart(
     item_data: CartItemUpdate,
     current_user=Depends(get_current_user)
@@ -45,7 +44,7 @@ async def update_item_in_cart(
 ## remove item from cart 
 @router.delete("/items/{product_id}", response_model=CartResponse)
 async def remove_item_from_cart(
-    product_id: str,
+    product_id: PydanticObjectId,
     current_user=Depends(get_current_user)
 ):
     return await remove_from_cart(current_user.id, product_id)
@@ -1,6 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from beanie import PydanticObjectId
-from app.config import get_settings
 from app.schemas.order import OrderResponse, OrderCreate, OrderList
 from app.models.order import OrderStatus
 from app.models.user import User
@@ -13,7 +12,6 @@ from app.services.order import (
     cancel_order as cancel_order_service
 )
 
-settings = get_settings()
 router = APIRouter()
 
 
@@ -34,10 +32,7 @@ async def list_orders_endpoint(
     size: int = Query(10, ge=1, le=100),
     current_user: User = Depends(get_current_user)
 ):
-    orders = await list_user_orders(current_user.id)
-    start = (page - 1) * size
-    paginated = orders[start:start + size]
-    return OrderList(orders=paginated, total=len(orders), page=page, size=size)
+    return await list_user_orders(current_user.id, page, size)
 
 
 @router.get("/{order_id}", response_model=OrderResponse, status_code=200)
@@ -1,22 +1,29 @@
 
 
 ## post /app/routers/product.py
-from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from typing import Optional
 from beanie import PydanticObjectId
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductList
+from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductList, ProductDeleteResponse
 from app.utils.exceptions import NotFoundException
+from app.utils.responses import fast_response
+from app.utils.cache import cache_get, cache_set, products_list_key, products_list_version, invalidate_products
+from app.config import get_settings
+from app.services.product import find_product, product_text_filter, product_prefix_filter
 from app.models.user import User
 from app.services.auth import get_current_superuser
-from app.config import get_settings
-settings = get_settings()
 router = APIRouter()
 
+## listing reads only the fields ProductResponse renders (_id is always returned)
+PRODUCT_LIST_PROJECTION = {field: 1 for field in ProductResponse.model_fields if field != "id"}
+
 def product_to_response(product: Product) -> ProductResponse:
     """Convert Product document to ProductResponse."""
-    return ProductResponse(
-        id=str(product.id),
+    return fast_response(
+        ProductResponse,
+        id=product.id,
         name=product.name,
         description=product.description,
         price=product.price,
@@ -28,6 +35,43 @@ def product_to_response(product: Product) -> ProductResponse:
         updated_at=product.updated_at
     )
 
+def product_doc_to_response(doc) -> ProductResponse:
+    """Convert a raw products document returned by motor to ProductResponse."""
+    return fast_response(
+        ProductResponse,
+        id=doc["_id"],
+        name=doc["name"],
+        description=doc.get("description"),
+        price=doc["price"],
+        stock=doc.get("stock", 0),
+        category=doc.get("category"),
+        tags=doc.get("tags", []),
+        is_active=doc.get("is_active", True),
+        created_at=doc["created_at"],
+        updated_at=doc["updated_at"]
+    )
+
+async def query_products_page(collection, query: dict, skip: int, size: int, no_total: bool, ranked: bool = False):
+    """Fetch one page of matching product documents and, unless no_total, their count."""
+    ## ranked orders $text matches by relevance; everything else keeps natural order
+    text_score = {"$meta": "textScore"}
+    if no_total:
+        cursor = collection.find(query, PRODUCT_LIST_PROJECTION)
+        if ranked:
+            cursor = cursor.sort([("score", text_score)])
+        return await cursor.skip(skip).limit(size).to_list(size), None
+    pipeline = [{"$match": query}] if query else []
+    if ranked:
+        pipeline.append({"$sort": {"score": text_score}})
+    ## count and fetch the page in a single round-trip
+    pipeline.append({"$facet": {
+        "products": [{"$skip": skip}, {"$limit": size}, {"$project": PRODUCT_LIST_PROJECTION}],
+        "total": [{"$count": "n"}],
+    }})
+    result = (await collection.aggregate(pipeline).to_list(1))[0]
+    total = result["total"][0]["n"] if result["total"] else 0 ## $count emits nothing for an empty match
+    return result["products"], total
+
 ## admin only
 @router.post("/", response_model=ProductResponse, status_code=201)
 async def create_product(
@@ -35,8 +79,9 @@ async def create_product(
     current_user: User = Depends(get_current_superuser),
 ):
     """Create a new product."""
-    product = Product(**product_data.dict())
+    product = Product(**product_data.model_dump())
     await product.insert()
+    await invalidate_products()
     return product_to_response(product)
 
 
@@ -46,33 +91,53 @@ async def create_product(
 async def list_products(
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Number of products per page"),
-    search: Optional[str] = Query(None, description="Search term for product name or description"),
+    search: Optional[str] = Query(None, description="Words to match in the product name or description, or a name prefix"),
+    exact_count: bool = Query(False, description="Count unfiltered listings exactly instead of from collection metadata"),
+    no_total: bool = Query(False, description="Skip counting the matches; total is returned as null"),
 ):
     """List products with pagination and optional search."""
-    if search:
-        products_query = Product.find(
-            {"$or": [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}},
-            ]}
+    ## pages are cached under the current list version; any product write bumps it
+    cache_key = products_list_key(await products_list_version(), page, size, search, exact_count, no_total)
+    cached = await cache_get(cache_key)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+    collection = Product.get_motor_collection()
+    skip = (page - 1) * size
+    if not search and not exact_count and not no_total:
+        ## unfiltered total comes from collection metadata in O(1)
+        total, docs = await asyncio.gather(
+            collection.estimated_document_count(),
+            collection.find({}, PRODUCT_LIST_PROJECTION).skip(skip).limit(size).to_list(size),
         )
+    elif not search:
+        docs, total = await query_products_page(collection, {}, skip, size, no_total)
     else:
-        products_query = Product.find()
-    total = await products_query.count()
-    products = await products_query.skip((page - 1) * size).limit(size).to_list()
-    return ProductList(
-        products=[product_to_response(prod) for prod in products],
+        docs, total = [], None
+        if get_settings().mongodb_text_search:
+            docs, total = await query_products_page(
+                collection, product_text_filter(search), skip, size, no_total, ranked=True
+            )
+        if not docs and not total:
+            ## no whole-word match at all: run the name-prefix search instead
+            docs, total = await query_products_page(collection, product_prefix_filter(search), skip, size, no_total)
+    product_list = fast_response(
+        ProductList,
+        products=[product_doc_to_response(doc) for doc in docs],
         total=total,
         page=page,
         size=size,
     )
+    ## serialize once: the same bytes go to the cache and to the client
+    body = product_list.model_dump_json()
+    await cache_set(cache_key, body, ex=get_settings().products_list_cache_ttl_seconds)
+    return Response(content=body, media_type="application/json")
 
 @router.get("/{product_id}", response_model=ProductResponse, status_code=200)
 async def get_product(
     product_id: PydanticObjectId,
 ):
     """Get product details by ID."""
-    product = await Product.get(product_id)
+    product = await find_product(product_id)
     if not product:
         raise NotFoundException(detail="Product not found")
     return product_to_response(product)
@@ -85,20 +150,22 @@ async def update_product(
     product = await Product.get(product_id)
     if not product:
         raise NotFoundException(detail="Product not found")
-    update_data = product_data.dict(exclude_unset=True) ## only update provided fields
+    update_data = product_data.model_dump(exclude_unset=True) ## only update provided fields
     for key, value in update_data.items():
         setattr(product, key, value)
     await product.save()
+    await invalidate_products(product_id)
     return product_to_response(product)
     
 
 ## delete product
-@router.delete("/{product_id}", status_code=200)
+@router.delete("/{product_id}", response_model=ProductDeleteResponse, status_code=200)
 async def delete_product(
     product_id: PydanticObjectId,
 ):
-    product = await Product.get(product_id)
-    if not product:
+    ## delete in one round-trip; deleted_count tells us whether it existed
+    result = await Product.get_motor_collection().delete_one({"_id": product_id})
+    if not result.deleted_count:
         raise NotFoundException(detail="Product not found")
-    await product.delete()
-    return {"message": "Product deleted"}
\ No newline at end of file
+    await invalidate_products(product_id)
+    return fast_response(ProductDeleteResponse, message="Product deleted", deleted=True, id=product_id)
\ No newline at end of file
@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional 
 from beanie import PydanticObjectId
 from datetime import datetime
@@ -34,13 +34,23 @@ class OrderResponse(BaseModel):
     created_at : datetime
     updated_at : datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+## OrderSummaryResponse (list view, without line items)
+class OrderSummaryResponse(BaseModel):
+    id : PydanticObjectId
+    user_id : PydanticObjectId
+    status : OrderStatus
+    total : float
+    shipping_address : Optional[str]
+    created_at : datetime
+    updated_at : datetime
 
 
 ## OrderList
 class OrderList(BaseModel):
-    orders : List[OrderResponse]
+    orders : List[OrderSummaryResponse]
     total : int
     page: int
     size : int
\ No newline at end of file
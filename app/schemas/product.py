@@ -1,6 +1,7 @@
 ## request/ response schemas for product operations
 
-from pydantic import BaseModel, Field
+from beanie import PydanticObjectId
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -23,7 +24,7 @@ class ProductUpdate(BaseModel):
     tags:Optional[list[str]] = Field(None, description="Tags associated with the product")
 
 class ProductResponse(BaseModel):
-    id:str
+    id:PydanticObjectId ## serialized as a string
     name:str
     description:Optional[str]
     price:float
@@ -34,12 +35,17 @@ class ProductResponse(BaseModel):
     created_at:datetime
     updated_at:datetime
 
-    class Config:
-        from_attributes = True ## enable ORM mode for compatibility with Beanie documents
+    model_config = ConfigDict(from_attributes=True) ## read attributes straight off Beanie documents
+
+## response schema for product deletion
+class ProductDeleteResponse(BaseModel):
+    message:str
+    deleted:bool = True
+    id:PydanticObjectId
 
 ## response schema for paginated product list
 class ProductList(BaseModel):
     products:list[ProductResponse]
-    total:int
+    total:Optional[int] ## None when the caller opted out of counting
     page:int
     size:int
\ No newline at end of file
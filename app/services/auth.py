@@ -2,6 +2,7 @@ from datetime import timedelta
 from typing import Optional
 from beanie import PydanticObjectId
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 
 from app.models.user import User
@@ -9,6 +10,7 @@ from app.schemas.user import UserCreate, Token
 from app.utils.security import (
     verify_password,
     get_password_hash,
+    needs_rehash,
     create_access_token,
     decode_access_token,
 )
@@ -19,8 +21,6 @@ from app.utils.exceptions import (
 )
 from app.config import get_settings
 
-settings = get_settings()
-
 # OAuth2 scheme for token extraction from headers
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -35,7 +35,7 @@ async def register_user(user_data: UserCreate) -> User:
     # Create new user with hashed password
     user = User(
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await run_in_threadpool(get_password_hash, user_data.password),
         full_name=user_data.full_name,
     )
     await user.insert()
@@ -49,9 +49,14 @@ async def authenticate_user(email: str, password: str) -> Optional[User]:
     
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # Hashing is CPU-bound; keep it off the event loop
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return None
     
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await run_in_threadpool(get_password_hash, password)
+        await user.save()
+    
     return user
 
 
@@ -66,6 +71,7 @@ async def login_user(email: str, password: str) -> Token:
         raise UnauthorizedException("User account is disabled")
     
     # Create access token
+    settings = get_settings()
     access_token = create_access_token(
         data={"sub": str(user.id)},
         expires_delta=timedelta(minutes=settings.access_token_expire_minutes),
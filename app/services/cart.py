@@ -1,14 +1,19 @@
 
-import datetime
+from datetime import datetime
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from app.models.cart import Cart
 from app.schemas.cart import CartItemAdd, CartItemUpdate, CartResponse, CartItemResponse
 from app.services.product import get_product
+from app.utils.responses import fast_response
 
 
 def cart_items_to_response(cart_items) -> list[CartItemResponse]:
     """Convert CartItem models to CartItemResponse schemas."""
     return [
-        CartItemResponse(
+        fast_response(
+            CartItemResponse,
             product_id=item.product_id,
             quantity=item.quantity,
             price=item.price
@@ -17,93 +22,128 @@ def cart_items_to_response(cart_items) -> list[CartItemResponse]:
     ]
 
 
+def cart_total(cart_items) -> float:
+    """Sum price * quantity over cart items."""
+    return sum(item.price * item.quantity for item in cart_items)
+
+
 ## get cart
 async def get_cart(user_id: str) -> CartResponse:
     cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
     if not cart:
-        return CartResponse(items=[], total_price=0.0)  ## return empty cart if not found
-    total_price = sum(item.price * item.quantity for item in cart.items) ## calculate total price
-    return CartResponse(items=cart_items_to_response(cart.items), total_price=total_price) ## return cart response
+        return fast_response(CartResponse, items=[], total_price=0.0)  ## return empty cart if not found
+    return fast_response(CartResponse, items=cart_items_to_response(cart.items), total_price=cart_total(cart.items)) ## return cart response
+
+## build cart response from a raw carts document returned by motor
+def cart_doc_to_response(doc) -> CartResponse:
+    if not doc:
+        return fast_response(CartResponse, items=[], total_price=0.0)  ## return empty cart if not found
+    items = [
+        fast_response(
+            CartItemResponse,
+            product_id=PydanticObjectId(item["product_id"]),
+            quantity=item["quantity"],
+            price=item["price"]
+        )
+        for item in doc.get("items", [])
+    ]
+    return fast_response(CartResponse, items=items, total_price=cart_total(items))
 
 ## add item to cart
 async def add_to_cart(user_id: str, item_data: CartItemAdd) -> CartResponse:
-    cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
     product = await get_product(item_data.product_id) ## fetch product details
-    if not cart:
-        cart = Cart(user_id=user_id, items=[])  ## create new cart if not found
     if product.stock < item_data.quantity:
         raise ValueError("Insufficient stock for the product")  ## raise error if insufficient stock
     
-    # Check if item already in cart
-    for item in cart.items:
-        if item.product_id == item_data.product_id:
-            item.quantity += item_data.quantity  ## update quantity if exists
-            break
-    else:
-        cart.items.append(  ## add new item to cart
-            {
-                "product_id": item_data.product_id,
-                "quantity": item_data.quantity,
-                "price": product.price,
-            }
+    carts = Cart.get_motor_collection()
+    now = datetime.utcnow()
+    for _ in range(2):
+        # Bump quantity in place if the item is already in the cart
+        doc = await carts.find_one_and_update(
+            {"user_id": user_id, "items.product_id": item_data.product_id},
+            {"$inc": {"items.$.quantity": item_data.quantity}, "$set": {"updated_at": now}},
+            return_document=ReturnDocument.AFTER,
         )
-    
-    cart.updated_at = datetime.datetime.utcnow()  ## update timestamp
-    await cart.save()  ## save cart to db
-    
-    total_price = sum(item.price * item.quantity for item in cart.items) ## calculate total price
-    return CartResponse(items=cart_items_to_response(cart.items), total_price=total_price) ## return updated cart response
+        if doc:
+            return cart_doc_to_response(doc)
+        
+        # Otherwise push a new line item, creating the cart if needed
+        try:
+            doc = await carts.find_one_and_update(
+                {"user_id": user_id, "items.product_id": {"$ne": item_data.product_id}},
+                {
+                    "$push": {"items": {
+                        "product_id": item_data.product_id,
+                        "quantity": item_data.quantity,
+                        "price": product.price,
+                    }},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return cart_doc_to_response(doc)
+        except DuplicateKeyError:
+            continue  ## a concurrent request added the same item first; retry the $inc
+    raise ValueError("Cart was modified concurrently, please retry")
+
 ## update cart item
 async def update_cart_item(user_id: str, item_data: CartItemUpdate) -> CartResponse:
-    cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
-    if not cart:
-        raise ValueError("Cart not found")  ## raise error if cart not found
-    
-    for item in cart.items:
-        if item.product_id == item_data.product_id:
-            item.quantity = item_data.quantity  ## update quantity
-            break
-    else:
-        raise ValueError("Item not found in cart")  ## raise error if item not found
-    
-    cart.updated_at = datetime.datetime.utcnow()  ## update timestamp
-    await cart.save()  ## save cart to db
-    
-    total_price = sum(item.price * item.quantity for item in cart.items) ## calculate total price
-    return CartResponse(items=cart_items_to_response(cart.items), total_price=total_price) ## return updated cart response
+    doc = await Cart.get_motor_collection().find_one_and_update(
+        {"user_id": user_id, "items.product_id": item_data.product_id},
+        {"$set": {"items.$.quantity": item_data.quantity, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not doc:
+        raise ValueError("Item not found in cart")  ## raise error if cart or item not found
+    return cart_doc_to_response(doc)
 
 ## remove from cart
-async def remove_from_cart(user_id: str, product_id: str) -> CartResponse:
-    cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
-    if not cart:
-        return CartResponse(items=[], total_price=0.0)  ## return empty cart if not found
-    
-    cart.items = [item for item in cart.items if str(item.product_id) != product_id]  ## remove item from cart
-    
-    cart.updated_at = datetime.datetime.utcnow()  ## update timestamp
-    await cart.save()  ## save cart to db
-    
-    total_price = sum(item.price * item.quantity for item in cart.items) ## calculate total price
-    return CartResponse(items=cart_items_to_response(cart.items), total_price=total_price) ## return updated cart response
+async def remove_from_cart(user_id: str, product_id: PydanticObjectId) -> CartResponse:
+    doc = await Cart.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        {"$pull": {"items": {"product_id": product_id}}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return cart_doc_to_response(doc)
 
 
 ## clear cart
-async def clear_cart(user_id: str) -> CartResponse:
-    cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
-    if not cart:
-        return CartResponse(items=[], total_price=0.0)  ## return empty cart if not found
-    
-    cart.items = []  ## clear all items from cart
-    
-    cart.updated_at = datetime.datetime.utcnow()  ## update timestamp
-    await cart.save()  ## save cart to db
-    
-    return CartResponse(items=[], total_price=0.0)  ## return empty cart response
+async def clear_cart(user_id: str, session=None) -> CartResponse:
+    await Cart.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$set": {"items": [], "updated_at": datetime.utcnow()}},
+        session=session,
+    )
+    return fast_response(CartResponse, items=[], total_price=0.0)  ## return empty cart response
+
+## put items back into a cart, undoing a clear_cart
+async def restore_cart(user_id: str, items) -> None:
+    await Cart.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$set": {
+            "items": [
+                {"product_id": item.product_id, "quantity": item.quantity, "price": item.price}
+                for item in items
+            ],
+            "updated_at": datetime.utcnow(),
+        }},
+    )
 
 ## get cart total
 async def get_cart_total(user_id: str) -> float:
     cart = await Cart.find_one(Cart.user_id == user_id) ## fetch cart by user_id
     if not cart:
         return 0.0  ## return 0 if cart not found
-    total_price = sum(item.price * item.quantity for item in cart.items) ## calculate total price
-    return total_price
\ No newline at end of file
+    return cart_total(cart.items)
+
+## bring cart line prices up to date with the catalogue
+async def reprice_cart(user_id: str, prices: dict) -> None:
+    await Cart.get_motor_collection().bulk_write([
+        UpdateOne(
+            {"user_id": user_id, "items.product_id": product_id},
+            {"$set": {"items.$.price": price, "updated_at": datetime.utcnow()}},
+        )
+        for product_id, price in prices.items()
+    ])
@@ -1,15 +1,26 @@
+import asyncio
+import logging
+import math
 from beanie import PydanticObjectId
-from app.schemas.order import OrderResponse, OrderCreate, OrderItemResponse
-from app.models.order import Order, OrderItem, OrderStatus
-from app.services.cart import get_cart, clear_cart
-from app.services.product import get_product, update_product_stock
-from typing import List
+from beanie.operators import In
+from app.schemas.order import OrderResponse, OrderCreate, OrderItemResponse, OrderList, OrderSummaryResponse
+from app.models.order import Order, OrderItem, OrderStatus, OrderSummary
+from app.services.cart import get_cart, clear_cart, restore_cart, reprice_cart
+from app.models.product import Product, ProductStock
+from app.services.product import reserve_stock, release_stock, take_stock
+from app.utils.responses import fast_response
+from app.utils.cache import invalidate_products
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
 
 def build_order_response(order: Order) -> OrderResponse:
-    return OrderResponse(
+    return fast_response(
+        OrderResponse,
         id=order.id,
         user_id=order.user_id,
-        items=[OrderItemResponse(
+        items=[fast_response(
+            OrderItemResponse,
             product_id=item.product_id,
             name=item.name,
             quantity=item.quantity,
@@ -30,27 +41,42 @@ async def create_order(user_id: PydanticObjectId, order_data: OrderCreate) -> Or
         raise ValueError("Cart is empty")
     
     # Validate items exist in cart
-    cart_product_ids = {item.product_id for item in user_cart.items}
+    cart_items = {item.product_id: item for item in user_cart.items}
     for item in order_data.items:
-        if item.product_id not in cart_product_ids:
+        if item.product_id not in cart_items:
             raise ValueError(f"Item {item.product_id} not in cart")
     
+    # Fetch name, price and stock of all ordered products in a single query
+    product_ids = list({item.product_id for item in order_data.items})
+    products = await Product.find(In(Product.id, product_ids)).project(ProductStock).to_list()
+    by_id = {product.id: product for product in products}
+    
     # Build order items with product details
     order_items = []
-    total = 0.0
+    quantities = {}
+    stale_prices = {}
     
     for item in order_data.items:
-        product = await get_product(item.product_id)
-        if product.stock < item.quantity:
+        product = by_id.get(item.product_id)
+        if product is None:
+            raise ValueError(f"Product {item.product_id} not found")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        if product.stock < quantities[item.product_id]:
             raise ValueError(f"Insufficient stock for {product.name}")
+        if cart_items[item.product_id].price != product.price:
+            stale_prices[item.product_id] = product.price
         
         order_items.append(OrderItem(
             product_id=item.product_id,
             name=product.name,
             quantity=item.quantity,
-            price=product.price
+            price=cart_items[item.product_id].price
         ))
-        total += product.price * item.quantity
+    if stale_prices:
+        # Never charge a price the customer did not see; refresh the cart so a retry checks out
+        await reprice_cart(user_id, stale_prices)
+        raise ValueError("Prices changed for some items in your cart; please review it and check out again")
+    total = math.fsum(item.price * item.quantity for item in order_items) ## exact sum of the line totals
     
     # Create and save order
     order = Order(
@@ -59,32 +85,78 @@ async def create_order(user_id: PydanticObjectId, order_data: OrderCreate) -> Or
         total=total,
         shipping_address=order_data.shipping_address
     )
-    await order.save()
-    
-    # Update stock for each product
-    for item in order_items:
-        await update_product_stock(item.product_id, -item.quantity)
-    
-    # Clear the cart
-    await clear_cart(user_id)
+    if get_settings().mongodb_transactions:
+        await commit_checkout_in_transaction(user_id, order, quantities)
+    else:
+        await commit_checkout_with_compensation(user_id, order, quantities, user_cart.items)
     
     # Build response
     return build_order_response(order)
 
 
+## take stock, save the order and clear the cart atomically (needs a replica set)
+async def commit_checkout_in_transaction(user_id: PydanticObjectId, order: Order, quantities: dict) -> None:
+    client = Order.get_motor_collection().database.client
+    
+    async def write_checkout(session) -> None:
+        await take_stock(quantities, session=session)
+        await order.insert(session=session)
+        await clear_cart(user_id, session=session)
+    
+    async with await client.start_session() as session:
+        ## with_transaction retries TransientTransactionError and UnknownTransactionCommitResult,
+        ## which write conflicts between concurrent checkouts raise
+        await session.with_transaction(write_checkout)
+    await invalidate_products(*quantities)
+
+
+## without transactions: reserve stock first, then undo it if the order cannot be saved
+async def commit_checkout_with_compensation(user_id: PydanticObjectId, order: Order, quantities: dict, cart_items) -> None:
+    # Take the stock atomically before committing the order
+    await reserve_stock(quantities)
+    
+    # Save the order and clear the cart concurrently; undo both if the order is not saved
+    inserted, cleared = await asyncio.gather(
+        order.insert(), clear_cart(user_id), return_exceptions=True
+    )
+    if isinstance(inserted, Exception):
+        await release_stock(quantities)
+        if not isinstance(cleared, Exception):
+            await restore_cart(user_id, cart_items)
+        raise inserted
+    if isinstance(cleared, Exception):
+        # The order is saved and the stock taken, so reporting a failure now would invite a
+        # retry that orders twice; try the clear once more and otherwise only log it
+        try:
+            await clear_cart(user_id)
+        except Exception:
+            logger.exception("Order %s was saved but the cart of user %s could not be cleared", order.id, user_id)
+
+
 async def get_order(order_id: PydanticObjectId) -> OrderResponse:
     order = await Order.get(order_id)
     if not order:
         raise Exception("order not found")
     return build_order_response(order)
 
-async def list_user_orders(user_id: PydanticObjectId) -> List[OrderResponse]:
-    orders = await Order.find(Order.user_id == user_id).to_list()
+async def list_user_orders(user_id: PydanticObjectId, page: int = 1, size: int = 10) -> OrderList:
+    orders_query = Order.find(Order.user_id == user_id)
+    total = await orders_query.count()
+    orders = await (
+        orders_query.sort(-Order.created_at)
+        .skip((page - 1) * size)
+        .limit(size)
+        .project(OrderSummary)  ## list view does not need the items array
+        .to_list()
+    )
 
-    return [
-        build_order_response(order)
-        for order in orders
-    ]
+    return fast_response(
+        OrderList,
+        orders=[fast_response(OrderSummaryResponse, **dict(order)) for order in orders], ## shallow copy of the projected fields
+        total=total,
+        page=page,
+        size=size,
+    )
 
 async def update_order_status(order_id: PydanticObjectId ,new_status: OrderStatus) -> OrderResponse:
 
@@ -107,9 +179,11 @@ async def cancel_order(order_id : PydanticObjectId):
     if order.status != OrderStatus.PENDING:
         raise ValueError(f"Cannot cancel order with status: {order.status.value}")
     
-    # Restore stock for each item
+    # Restore stock for every item in a single bulk write
+    quantities = {}
     for item in order.items:
-        await update_product_stock(item.product_id, item.quantity)  # Add back stock
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    await release_stock(quantities)
     
     order.status = OrderStatus.CANCELLED
     await order.save()
@@ -1,7 +1,14 @@
 
+import asyncio
+import re
+from datetime import datetime
+from pymongo import UpdateOne
 from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductList
 from app.models.product import Product
 from beanie import PydanticObjectId
+from typing import Optional
+from app.config import get_settings
+from app.utils.cache import cache_get, cache_set, product_key, invalidate_products
 
 ## create a product
 async def create_product(product_data: ProductCreate) -> ProductResponse:
@@ -16,13 +23,38 @@ async def create_product(product_data: ProductCreate) -> ProductResponse:
     )
     
     await product.insert() ## save to db
-    return ProductResponse.from_orm(product) ## return response schema
+    await invalidate_products()
+    return ProductResponse.model_validate(product) ## return response schema
+
+## find product, served from the cache when possible
+
+async def find_product(product_id) -> Optional[Product]:
+    """Cache-aside product lookup; returns None if the product does not exist."""
+    raw = await cache_get(product_key(product_id))
+    if raw:
+        return Product.model_validate_json(raw)
+    product = await Product.get(product_id)
+    if product:
+        await cache_set(product_key(product_id), product.model_dump_json(), ex=get_settings().product_cache_ttl_seconds)
+    return product
+
+## build the product search filters
+
+def product_text_filter(search: str) -> dict:
+    """Whole-word match over name and description via the text index."""
+    return {"$text": {"$search": search}}
+
+
+def product_prefix_filter(search: str) -> dict:
+    """Case-insensitive, literal name prefix; used when no whole word matches."""
+    ## anchored prefix on the lowercased copy, so the name_lower index still applies
+    return {"name_lower": {"$regex": f"^{re.escape(search.lower())}"}}
 
 ## get proudct
 
 async def get_product(product_id: str) -> Product:
     ## get product by id
-    product = await Product.get(product_id)
+    product = await find_product(product_id)
     if not product:
         raise Exception("Product not found")  ## custom exception can be used
     return product
@@ -35,7 +67,7 @@ async def list_products(page: int = 1, size: int = 10) -> ProductList:
     total = await Product.find().count() ## total count for pagination
     
     return ProductList(
-        products=[ProductResponse.from_orm(prod) for prod in products], ## map to response schema
+        products=[ProductResponse.model_validate(prod) for prod in products], ## map to response schema
         total=total,
         page=page,
         size=size,
@@ -63,21 +95,67 @@ async def update_product(product_id: str, product_data: ProductUpdate) -> Produc
         product.tags = product_data.tags
     
     await product.save()  ## save changes to db
-    return ProductResponse.from_orm(product)
+    await invalidate_products(product_id)
+    return ProductResponse.model_validate(product)
 
-## update product stock by quantity delta
-async def update_product_stock(product_id: PydanticObjectId, quantity_delta: int) -> Product:
-    """Update product stock by a quantity delta (positive to add, negative to reduce)."""
-    product = await Product.get(product_id)
-    if not product:
-        raise Exception("Product not found")
-    
-    product.stock += quantity_delta
-    if product.stock < 0:
+## reserve stock for several products at once
+async def reserve_stock(quantities: dict) -> None:
+    """Atomically take stock for each product id -> quantity, rolling back if any is short."""
+    collection = Product.get_motor_collection()
+    now = datetime.utcnow()
+    results = await asyncio.gather(*[
+        collection.update_one(
+            {"_id": product_id, "stock": {"$gte": quantity}},  ## guard: never go below zero
+            {"$inc": {"stock": -quantity}, "$set": {"updated_at": now}},
+        )
+        for product_id, quantity in quantities.items()
+    ])
+    reserved = {
+        product_id: quantity
+        for (product_id, quantity), result in zip(quantities.items(), results)
+        if result.modified_count
+    }
+    if reserved:
+        await invalidate_products(*reserved)
+    if len(reserved) < len(quantities):
+        await release_stock(reserved)  ## undo the partial reservation
         raise ValueError("Insufficient stock")
-    
-    await product.save()
-    return product
+
+## take stock for several products in one round-trip inside a transaction
+async def take_stock(quantities: dict, session) -> None:
+    """Take stock for each product id -> quantity; raising aborts the caller's transaction.
+
+    The caller invalidates the product cache once the transaction commits.
+    """
+    now = datetime.utcnow()
+    result = await Product.get_motor_collection().bulk_write(
+        [
+            UpdateOne(
+                {"_id": product_id, "stock": {"$gte": quantity}},  ## guard: never go below zero
+                {"$inc": {"stock": -quantity}, "$set": {"updated_at": now}},
+            )
+            for product_id, quantity in quantities.items()
+        ],
+        ordered=False,
+        session=session,
+    )
+    if result.matched_count < len(quantities):
+        raise ValueError("Insufficient stock")
+
+## give stock back for several products in one round-trip
+async def release_stock(quantities: dict) -> None:
+    """Return stock for each product id -> quantity."""
+    if not quantities:
+        return
+    now = datetime.utcnow()
+    await Product.get_motor_collection().bulk_write(
+        [
+            UpdateOne({"_id": product_id}, {"$inc": {"stock": quantity}, "$set": {"updated_at": now}})
+            for product_id, quantity in quantities.items()
+        ],
+        ordered=False,
+    )
+    await invalidate_products(*quantities)
 
 ## delete product
 
@@ -87,5 +165,6 @@ async def delete_product(product_id: str) -> None:
         raise Exception("Product not found")  ## custom exception can be used
     
     await product.delete()  ## delete from db
-    return ProductResponse.from_orm(product)
+    await invalidate_products(product_id)
+    return ProductResponse.model_validate(product)
 
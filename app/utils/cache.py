@@ -0,0 +1,100 @@
+from typing import Optional
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from app.config import get_settings
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Return the shared Redis client, or None when caching is disabled."""
+    global _client
+    settings = get_settings()
+    if not settings.cache_enabled:
+        return None
+    if _client is None:
+        _client = redis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=settings.redis_socket_connect_timeout_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+        )
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client if one was opened."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+PRODUCTS_LIST_VERSION_KEY = "products:list_version"
+
+
+def product_key(product_id) -> str:
+    """Cache key for a single product document."""
+    return f"product:{product_id}"
+
+
+def products_list_key(
+    version: int, page: int, size: int, search: Optional[str], exact_count: bool = False, no_total: bool = False
+) -> str:
+    """Cache key for one page of the product listing under a given list version."""
+    return (
+        f"v{version}:products:page:{page}:size:{size}:search:{search or ''}"
+        f":exact:{int(exact_count)}:no_total:{int(no_total)}"
+    )
+
+
+async def products_list_version() -> int:
+    """Current product listing version; bumping it orphans every cached page."""
+    raw = await cache_get(PRODUCTS_LIST_VERSION_KEY)
+    return int(raw) if raw else 0  ## the first INCR yields 1, so a missing key must read lower
+
+
+async def invalidate_products(*product_ids) -> None:
+    """Drop cached product documents and invalidate all cached listing pages."""
+    await cache_delete(*[product_key(product_id) for product_id in product_ids])
+    await cache_incr(PRODUCTS_LIST_VERSION_KEY)
+
+
+## the cache is best-effort: a Redis outage falls through to MongoDB
+async def cache_get(key: str) -> Optional[bytes]:
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except RedisError:
+        return None
+
+
+async def cache_set(key: str, value, ex: int) -> None:
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ex)
+    except RedisError:
+        pass
+
+
+async def cache_incr(key: str) -> None:
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.incr(key)
+    except RedisError:
+        pass
+
+
+async def cache_delete(*keys: str) -> None:
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        await client.delete(*keys)
+    except RedisError:
+        pass
@@ -0,0 +1,9 @@
+from typing import Type, TypeVar
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def fast_response(cls: Type[ModelT], **kwargs) -> ModelT:
+    """Build a response schema from trusted (DB-sourced) data, skipping validation."""
+    return cls.model_construct(**kwargs)
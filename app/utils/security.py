@@ -1,13 +1,21 @@
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
 
-settings = get_settings()
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: argon2id for new hashes, bcrypt kept so existing hashes still verify
+# (and get upgraded on next login via needs_rehash)
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=1,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -20,8 +28,14 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash uses a deprecated scheme or outdated parameters."""
+    return pwd_context.needs_update(hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
+    settings = get_settings()
     to_encode = data.copy()
     
     if expires_delta:
@@ -35,10 +49,25 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify a JWT token."""
+@lru_cache(maxsize=10_000)
+def _verify_token(token: str) -> Optional[dict]:
+    """Verify a JWT signature and return its claims (memoized per token)."""
+    settings = get_settings()
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Decode and verify a JWT token."""
+    payload = _verify_token(token)
+    if payload is None:
+        return None
+    
+    # Cached claims may outlive the token, so expiry is re-checked on every call
+    exp = payload.get("exp")
+    if exp is not None and exp <= time.time():
+        return None
+    
+    return dict(payload)
\ No newline at end of file
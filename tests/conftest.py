@@ -1,20 +1,31 @@
 """
 Test configuration and fixtures for the e-commerce platform.
 """
+import os
 import pytest
+import pytest_asyncio
 import asyncio
 from typing import AsyncGenerator, Generator
 from httpx import AsyncClient, ASGITransport
-from beanie import init_beanie
+from beanie import init_beanie, PydanticObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 from mongomock_motor import AsyncMongoMockClient
+from fakeredis.aioredis import FakeRedis
+
+# Keep rate-limit counters in process; tests do not run against a Redis server
+os.environ.setdefault("RATE_LIMIT_STORAGE_URL", "memory://")
+# mongomock cannot execute $text, so search runs on the name-prefix path
+os.environ.setdefault("MONGODB_TEXT_SEARCH", "false")
 
 from app.main import app
 from app.models.user import User
 from app.models.product import Product
 from app.models.cart import Cart
 from app.models.order import Order
+from passlib.context import CryptContext
+from app.utils import security, cache
 from app.utils.security import get_password_hash, create_access_token
+from app.middleware.rate_limiter import limiter
 
 
 @pytest.fixture(scope="session")
@@ -25,36 +36,112 @@ def event_loop() -> Generator:
     loop.close()
 
 
-@pytest.fixture(autouse=True)
-async def setup_database():
-    """Set up a mock MongoDB database for tests."""
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def _init_beanie():
+    """Initialise Beanie against a mock MongoDB database once per session."""
     client = AsyncMongoMockClient()
+    ## one database per xdist worker so parallel runs never share state
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
     await init_beanie(
-        database=client["test_ecommerce"],
+        database=client[f"test_ecommerce_{worker_id}"],
         document_models=[User, Product, Cart, Order]
     )
+
+
+@pytest.fixture(scope="session")
+def _fake_redis():
+    """Back the application cache with an in-memory Redis for the whole session."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(cache, "_client", FakeRedis())
+        yield cache._client
+
+
+@pytest.fixture(autouse=True)
+async def setup_database(_init_beanie, _fake_redis):
+    """Give each test an empty database and cache."""
+    yield
+    # Cleanup after each test; the collections are independent so clear them together
+    await asyncio.gather(
+        User.delete_all(),
+        Product.delete_all(),
+        Cart.delete_all(),
+        Order.delete_all(),
+        _fake_redis.flushall(),
+    )
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start each test with fresh rate-limit counters; login tests share one 5/minute quota."""
+    limiter.reset()
     yield
-    # Cleanup after each test
-    await User.delete_all()
-    await Product.delete_all()
-    await Cart.delete_all()
-    await Order.delete_all()
 
 
-@pytest.fixture
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
 async def client() -> AsyncGenerator[AsyncClient, None]:
-    """Create an async test client."""
+    """Create one async test client shared by the whole session."""
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
 
 
+@pytest.fixture(scope="session", autouse=True)
+def fast_password_hashing():
+    """Swap in minimum-cost argon2/bcrypt parameters; same schemes, so rehash logic still runs."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(security, "pwd_context", CryptContext(
+            schemes=["argon2", "bcrypt"],
+            deprecated="auto",
+            argon2__type="ID",
+            argon2__time_cost=1,
+            argon2__memory_cost=8,
+            argon2__parallelism=1,
+            bcrypt__rounds=4,
+        ))
+        yield
+
+
+@pytest.fixture(scope="session")
+def hashed_passwords() -> dict:
+    """Hash the fixture users' passwords once; argon2 is deliberately slow."""
+    return {
+        password: get_password_hash(password)
+        for password in ("testpassword123", "adminpassword123")
+    }
+
+
+@pytest.fixture(scope="session")
+def fixture_user_ids() -> dict:
+    """Fixed ids for the fixture users, so their tokens can be minted once per session."""
+    return {"user": PydanticObjectId(), "admin": PydanticObjectId()}
+
+
+@pytest.fixture(scope="session")
+def access_tokens(fixture_user_ids) -> dict:
+    """Mint one access token per fixture user for the whole session."""
+    return {
+        role: create_access_token(data={"sub": str(user_id)})
+        for role, user_id in fixture_user_ids.items()
+    }
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def _warmup(_init_beanie, _fake_redis, client, fast_password_hashing, hashed_passwords):
+    """Pay first-use costs once up front so no single test's timing absorbs them."""
+    await asyncio.gather(
+        Product.get_motor_collection().database.command("ping"),
+        _fake_redis.ping(),
+        client.get("/health"),  ## not cached or rate-limited, so leaves no state behind
+    )
+
+
 @pytest.fixture
-async def test_user() -> User:
+async def test_user(hashed_passwords, fixture_user_ids) -> User:
     """Create a regular test user."""
     user = User(
+        id=fixture_user_ids["user"],
         email="testuser@example.com",
-        hashed_password=get_password_hash("testpassword123"),
+        hashed_password=hashed_passwords["testpassword123"],
         full_name="Test User",
         is_active=True,
         is_superuser=False
@@ -64,11 +151,12 @@ async def test_user() -> User:
 
 
 @pytest.fixture
-async def admin_user() -> User:
+async def admin_user(hashed_passwords, fixture_user_ids) -> User:
     """Create an admin/superuser test user."""
     user = User(
+        id=fixture_user_ids["admin"],
         email="admin@example.com",
-        hashed_password=get_password_hash("adminpassword123"),
+        hashed_password=hashed_passwords["adminpassword123"],
         full_name="Admin User",
         is_active=True,
         is_superuser=True
@@ -78,17 +166,32 @@ async def admin_user() -> User:
 
 
 @pytest.fixture
-def auth_headers(test_user: User) -> dict:
+def auth_headers(test_user: User, access_tokens) -> dict:
     """Create authentication headers for regular user."""
-    token = create_access_token(data={"sub": str(test_user.id)})
-    return {"Authorization": f"Bearer {token}"}
+    return {"Authorization": f"Bearer {access_tokens['user']}"}
 
 
 @pytest.fixture
-def admin_headers(admin_user: User) -> dict:
+def admin_headers(admin_user: User, access_tokens) -> dict:
     """Create authentication headers for admin user."""
-    token = create_access_token(data={"sub": str(admin_user.id)})
-    return {"Authorization": f"Bearer {token}"}
+    return {"Authorization": f"Bearer {access_tokens['admin']}"}
+
+
+async def _insert_all(model, documents: list) -> list:
+    """insert_many, writing the generated ids back to the documents (Beanie does not)."""
+    result = await model.insert_many(documents)
+    for document, inserted_id in zip(documents, result.inserted_ids):
+        document.id = inserted_id
+    return documents
+
+
+@pytest.fixture
+def read_stock():
+    """Read just a product's stock, skipping Beanie hydration."""
+    async def _read(product_id) -> int:
+        doc = await Product.get_motor_collection().find_one({"_id": product_id}, {"stock": 1})
+        return doc["stock"]
+    return _read
 
 
 @pytest.fixture
@@ -110,9 +213,8 @@ async def test_product() -> Product:
 @pytest.fixture
 async def test_products() -> list[Product]:
     """Create multiple test products."""
-    products = []
-    for i in range(5):
-        product = Product(
+    products = [
+        Product(
             name=f"Product {i+1}",
             description=f"Description for product {i+1}",
             price=10.00 + i * 5,
@@ -121,24 +223,89 @@ async def test_products() -> list[Product]:
             tags=["test"],
             is_active=True
         )
-        await product.insert()
-        products.append(product)
-    return products
+        for i in range(5)
+    ]
+    return await _insert_all(Product, products)
+
+
+@pytest.fixture
+def make_cart(test_user: User):
+    """Factory fixture: insert a cart for the test user holding the given CartItems."""
+    async def _make(items) -> Cart:
+        cart = Cart(user_id=test_user.id, items=items)
+        await cart.insert()
+        return cart
+    return _make
+
+
+def _build_order(items, user_id, shipping_address) -> Order:
+    """Order holding the given OrderItems, totalled from its lines."""
+    return Order(
+        user_id=user_id,
+        items=items,
+        total=sum(item.price * item.quantity for item in items),
+        shipping_address=shipping_address
+    )
 
 
 @pytest.fixture
-async def cart_with_items(test_user: User, test_product: Product) -> Cart:
+def make_order(test_user: User):
+    """Factory fixture: insert an order (owned by the test user unless given) holding the given OrderItems."""
+    async def _make(items, user_id=None, shipping_address="Test Address") -> Order:
+        order = _build_order(items, user_id or test_user.id, shipping_address)
+        await order.insert()
+        return order
+    return _make
+
+
+@pytest.fixture
+def make_orders(test_user: User):
+    """Factory fixture: bulk-insert one order per list of OrderItems with a single insert_many."""
+    async def _make(item_lists, user_id=None, shipping_address="Test Address") -> list[Order]:
+        orders = [_build_order(items, user_id or test_user.id, shipping_address) for items in item_lists]
+        return await _insert_all(Order, orders)
+    return _make
+
+
+@pytest.fixture
+async def cart_with_items(make_cart, test_product: Product) -> Cart:
     """Create a cart with items for the test user."""
     from app.models.cart import CartItem
-    cart = Cart(
-        user_id=test_user.id,
-        items=[
-            CartItem(
+    return await make_cart([
+        CartItem(
+            product_id=test_product.id,
+            quantity=2,
+            price=test_product.price
+        )
+    ])
+
+
+@pytest.fixture
+async def pending_order(make_order, test_product: Product) -> Order:
+    """Insert a pending order for the test user directly, skipping checkout."""
+    from app.models.order import OrderItem
+    return await make_order([
+        OrderItem(
+            product_id=test_product.id,
+            name=test_product.name,
+            quantity=2,
+            price=test_product.price
+        )
+    ])
+
+
+@pytest.fixture
+async def seeded_orders(make_orders, test_product: Product) -> list[Order]:
+    """Insert three pending orders for the test user with one insert_many."""
+    from app.models.order import OrderItem
+    return await make_orders([
+        [
+            OrderItem(
                 product_id=test_product.id,
-                quantity=2,
+                name=test_product.name,
+                quantity=i + 1,
                 price=test_product.price
             )
         ]
-    )
-    await cart.insert()
-    return cart
+        for i in range(3)
+    ])
@@ -11,6 +11,11 @@ from httpx import AsyncClient
 
 pytestmark = pytest.mark.asyncio
 
+# Over-stock adds: the router maps the service's ValueError to 400; 422/500 tolerated
+_OVER_STOCK_STATUSES = frozenset({400, 422, 500})
+# Unknown product or cart line: 404 or 400 depending on the endpoint's error mapping
+_MISSING_ITEM_STATUSES = frozenset({400, 404, 500})
+
 
 class TestGetCart:
     """Tests for getting the user's cart."""
@@ -158,69 +163,31 @@ class TestAddToCart:
         
         assert response.status_code == 401
     
-    async def test_add_item_insufficient_stock(
-        self, client: AsyncClient, auth_headers, test_product
-    ):
-        """Add item with quantity exceeding stock returns error."""
-        response = await client.post(
-            "/api/v1/cart/items",
-            json={
-                "product_id": str(test_product.id),
-                "quantity": 999  # More than available stock (100)
-            },
-            headers=auth_headers
-        )
-        
-        # Should fail due to insufficient stock
-        assert response.status_code in [400, 422, 500]
-    
-    async def test_add_item_invalid_product_id(
-        self, client: AsyncClient, auth_headers
-    ):
-        """Add item with non-existent product ID returns error."""
-        fake_id = "507f1f77bcf86cd799439011"
-        
-        response = await client.post(
-            "/api/v1/cart/items",
-            json={
-                "product_id": fake_id,
-                "quantity": 1
-            },
-            headers=auth_headers
-        )
-        
-        # Should fail due to product not found
-        assert response.status_code in [400, 404, 500]
-    
-    async def test_add_item_zero_quantity(
-        self, client: AsyncClient, auth_headers, test_product
+    @pytest.mark.parametrize(
+        "product_id, quantity, expected_statuses",
+        [
+            (None, 0, frozenset({422})),  # Validation error
+            (None, -1, frozenset({422})),  # Validation error
+            (None, 999, _OVER_STOCK_STATUSES),  # More than available stock (100)
+            ("507f1f77bcf86cd799439011", 1, _MISSING_ITEM_STATUSES),  # Product does not exist
+        ],
+        ids=["zero-quantity", "negative-quantity", "insufficient-stock", "invalid-product-id"],
+    )
+    async def test_add_item_rejected(
+        self, client: AsyncClient, auth_headers, test_product,
+        product_id, quantity, expected_statuses
     ):
-        """Add item with zero quantity returns validation error."""
+        """Add item with an invalid quantity or product returns an error."""
         response = await client.post(
             "/api/v1/cart/items",
             json={
-                "product_id": str(test_product.id),
-                "quantity": 0
+                "product_id": product_id or str(test_product.id),
+                "quantity": quantity
             },
             headers=auth_headers
         )
         
-        assert response.status_code == 422  # Validation error
-    
-    async def test_add_item_negative_quantity(
-        self, client: AsyncClient, auth_headers, test_product
-    ):
-        """Add item with negative quantity returns validation error."""
-        response = await client.post(
-            "/api/v1/cart/items",
-            json={
-                "product_id": str(test_product.id),
-                "quantity": -1
-            },
-            headers=auth_headers
-        )
-        
-        assert response.status_code == 422  # Validation error
+        assert response.status_code in expected_statuses
 
 
 class TestUpdateCartItem:
@@ -231,7 +198,7 @@ class TestUpdateCartItem:
     ):
         """Update item quantity in cart."""
         response = await client.put(
-            "/api/v1/cart/cart/items",
+            "/api/v1/cart/items",
             json={
                 "product_id": str(test_product.id),
                 "quantity": 5
@@ -249,7 +216,7 @@ class TestUpdateCartItem:
     ):
         """Update item not in cart returns error."""
         response = await client.put(
-            "/api/v1/cart/cart/items",
+            "/api/v1/cart/items",
             json={
                 "product_id": str(test_product.id),
                 "quantity": 3
@@ -258,7 +225,7 @@ class TestUpdateCartItem:
         )
         
         # Should fail - cart doesn't exist or item not in cart
-        assert response.status_code in [400, 404, 500]
+        assert response.status_code in _MISSING_ITEM_STATUSES
 
 
 class TestRemoveFromCart:
@@ -279,6 +246,41 @@ class TestRemoveFromCart:
         assert len(data["items"]) == 0
         assert data["total_price"] == 0.0
     
+    async def test_remove_one_item_keeps_others(
+        self, client: AsyncClient, auth_headers, make_cart, test_products
+    ):
+        """Remove one item leaves the remaining items in the cart."""
+        from app.models.cart import CartItem
+        
+        product1 = test_products[0]
+        product2 = test_products[1]
+        await make_cart([
+            CartItem(product_id=product1.id, quantity=1, price=product1.price),
+            CartItem(product_id=product2.id, quantity=2, price=product2.price)
+        ])
+        
+        response = await client.delete(
+            f"/api/v1/cart/items/{product1.id}",
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) == 1
+        assert data["items"][0]["product_id"] == str(product2.id)
+        assert data["total_price"] == product2.price * 2
+    
+    async def test_remove_item_invalid_product_id_returns_422(
+        self, client: AsyncClient, auth_headers
+    ):
+        """Remove item with a malformed product ID returns validation error."""
+        response = await client.delete(
+            "/api/v1/cart/items/not-an-object-id",
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 422
+    
     async def test_remove_item_without_auth_returns_401(
         self, client: AsyncClient, test_product
     ):
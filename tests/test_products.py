@@ -6,31 +6,50 @@ Test Cases:
 - Create product as admin → success
 - Create product as regular user → 403
 """
+import asyncio
 import pytest
+from types import MappingProxyType, SimpleNamespace
 from httpx import AsyncClient
+from app.models.product import Product
+from app.config import get_settings
+from app.routers import product as product_router
 
 pytestmark = pytest.mark.asyncio
 
+_PRODUCTS_URL = "/api/v1/products/"
+
+# Read-only payloads; tests derive variants with {**BASE, ...} so none can mutate them
+_FULL_PRODUCT = MappingProxyType({
+    "name": "New Product",
+    "description": "A brand new product",
+    "price": 49.99,
+    "stock": 25,
+    "category": "Test",
+    "tags": ("new", "featured")
+})
+_MIN_PRODUCT = MappingProxyType({
+    "name": "Minimal Product",
+    "price": 9.99
+})
+# Valid ObjectId format that no fixture ever inserts
+_MISSING_ID = "507f1f77bcf86cd799439011"
+
 
 class TestListProducts:
     """Tests for listing products (public endpoint)."""
     
     async def test_list_products_public_no_auth_required(self, client: AsyncClient):
         """List products without authentication succeeds."""
-        response = await client.get("/api/v1/products/")
+        response = await client.get(_PRODUCTS_URL)
         
         assert response.status_code == 200
-        data = response.json()
-        assert "products" in data
-        assert "total" in data
-        assert "page" in data
-        assert "size" in data
+        assert {"products", "total", "page", "size"} <= set(response.json())
     
     async def test_list_products_returns_products(
         self, client: AsyncClient, test_products
     ):
         """List products returns all available products."""
-        response = await client.get("/api/v1/products/")
+        response = await client.get(_PRODUCTS_URL)
         
         assert response.status_code == 200
         data = response.json()
@@ -41,41 +60,126 @@ class TestListProducts:
         self, client: AsyncClient, test_products
     ):
         """List products with pagination works correctly."""
-        # Get first page with 2 items
-        response = await client.get("/api/v1/products/?page=1&size=2")
+        # The two pages are independent reads, so fetch them together;
+        # the total is covered by test_list_products_returns_products
+        first, second = await asyncio.gather(
+            client.get(_PRODUCTS_URL, params={"page": 1, "size": 2, "no_total": True}),
+            client.get(_PRODUCTS_URL, params={"page": 2, "size": 2, "no_total": True})
+        )
+        
+        data = first.json()
+        assert (first.status_code, len(data["products"]), data["page"], data["size"], data["total"]) == (
+            200, 2, 1, 2, None
+        )
+        
+        data = second.json()
+        assert (second.status_code, len(data["products"]), data["page"]) == (200, 2, 2)
+    
+    async def test_list_products_exact_count(
+        self, client: AsyncClient, test_products
+    ):
+        """exact_count=true counts the collection exactly."""
+        response = await client.get(_PRODUCTS_URL, params={"exact_count": True, "size": 2})
         
         assert response.status_code == 200
         data = response.json()
-        assert len(data["products"]) == 2
-        assert data["page"] == 1
-        assert data["size"] == 2
         assert data["total"] == 5
-        
-        # Get second page
-        response = await client.get("/api/v1/products/?page=2&size=2")
+        assert len(data["products"]) == 2
+    
+    async def test_list_products_no_total_with_search(
+        self, client: AsyncClient, test_products
+    ):
+        """no_total skips counting but still applies the search filter."""
+        response = await client.get(_PRODUCTS_URL, params={"search": "Product 1", "no_total": True})
         
         assert response.status_code == 200
         data = response.json()
-        assert len(data["products"]) == 2
-        assert data["page"] == 2
+        assert data["total"] is None
+        assert [p["name"] for p in data["products"]] == ["Product 1"]
     
     async def test_list_products_search(
         self, client: AsyncClient, test_products
     ):
         """List products with search filter works correctly."""
-        response = await client.get("/api/v1/products/?search=Product%201")
+        response = await client.get(_PRODUCTS_URL, params={"search": "Product 1"})
         
         assert response.status_code == 200
         data = response.json()
         # Should find at least one product matching search
         assert data["total"] >= 1
         # Verify the returned product matches search
-        found = any("1" in p["name"] for p in data["products"])
-        assert found
+        names = "\n".join(p["name"] for p in data["products"])
+        assert "Product 1" in names
+
+    async def test_list_products_search_prefix_ignores_case(
+        self, client: AsyncClient, test_products
+    ):
+        """The name-prefix fallback matches regardless of case."""
+        response = await client.get(_PRODUCTS_URL, params={"search": "pRODUCT 1"})
+
+        assert response.status_code == 200
+        assert [p["name"] for p in response.json()["products"]] == ["Product 1"]
+
+    async def test_list_products_search_matches_name_prefix_only(
+        self, client: AsyncClient, test_products
+    ):
+        """The fallback matches a literal name prefix, not a substring or regex."""
+        responses = await asyncio.gather(
+            client.get(_PRODUCTS_URL, params={"search": "1"}),
+            client.get(_PRODUCTS_URL, params={"search": "Product.*"})
+        )
+
+        for response in responses:
+            assert response.status_code == 200
+            assert response.json()["total"] == 0
+
+    async def test_list_products_search_finds_backfilled_product(
+        self, client: AsyncClient
+    ):
+        """A product stored before name_lower existed is found once the startup backfill has run."""
+        from datetime import datetime
+        from app.database import backfill_name_lower
+        
+        now = datetime.utcnow()
+        await Product.get_motor_collection().insert_one({
+            "name": "Gaming Laptop", "price": 999.0, "stock": 1, "tags": [],
+            "is_active": True, "created_at": now, "updated_at": now,
+        })
+        await backfill_name_lower()
+        
+        response = await client.get(_PRODUCTS_URL, params={"search": "Gam"})
+        
+        assert [p["name"] for p in response.json()["products"]] == ["Gaming Laptop"]
+
+    async def test_list_products_search_finds_renamed_product(
+        self, client: AsyncClient, test_product
+    ):
+        """Renaming a product through the API keeps the search copy of its name current."""
+        await client.put(_PRODUCTS_URL + str(test_product.id), json={"name": "Gaming Laptop"})
+
+        response = await client.get(_PRODUCTS_URL, params={"search": "gaming"})
+
+        assert [p["name"] for p in response.json()["products"]] == ["Gaming Laptop"]
+
+    async def test_list_products_cache_invalidated_on_create(
+        self, client: AsyncClient, admin_headers
+    ):
+        """Creating a product invalidates every cached listing page."""
+        response = await client.get(_PRODUCTS_URL)
+        assert response.json()["total"] == 0
+        
+        await client.post(
+            _PRODUCTS_URL,
+            json={"name": "Fresh Product", "price": 9.99},
+            headers=admin_headers
+        )
+        
+        response = await client.get(_PRODUCTS_URL)
+        assert response.json()["total"] == 1
     
     async def test_list_products_empty_database(self, client: AsyncClient):
         """List products when database is empty returns empty list."""
-        response = await client.get("/api/v1/products/")
+        response = await client.get(_PRODUCTS_URL)
         
         assert response.status_code == 200
         data = response.json()
@@ -90,25 +194,35 @@ class TestGetProduct:
         self, client: AsyncClient, test_product
     ):
         """Get product by ID returns product details."""
-        response = await client.get(f"/api/v1/products/{test_product.id}")
+        response = await client.get(_PRODUCTS_URL + str(test_product.id))
         
         assert response.status_code == 200
         data = response.json()
-        assert data["name"] == test_product.name
-        assert data["description"] == test_product.description
-        assert data["price"] == test_product.price
-        assert data["stock"] == test_product.stock
+        assert (data["name"], data["description"], data["price"], data["stock"]) == (
+            test_product.name, test_product.description, test_product.price, test_product.stock
+        )
     
-    async def test_get_product_not_found(self, client: AsyncClient):
-        """Get product with non-existent ID returns 404."""
-        fake_id = "507f1f77bcf86cd799439011"  # Valid ObjectId format
-        response = await client.get(f"/api/v1/products/{fake_id}")
+    async def test_get_product_is_cached_until_updated(
+        self, client: AsyncClient, test_product
+    ):
+        """Product reads are cached; an update through the API invalidates them."""
+        await client.get(_PRODUCTS_URL + str(test_product.id))
         
-        assert response.status_code == 404
+        # A write that bypasses the API is not seen while the entry is cached
+        await Product.get_motor_collection().update_one(
+            {"_id": test_product.id}, {"$set": {"stock": 1}}
+        )
+        response = await client.get(_PRODUCTS_URL + str(test_product.id))
+        assert response.json()["stock"] == test_product.stock
+        
+        await client.put(_PRODUCTS_URL + str(test_product.id), json={"price": 5.00})
+        response = await client.get(_PRODUCTS_URL + str(test_product.id))
+        assert response.json()["stock"] == 1
+        assert response.json()["price"] == 5.00
     
     async def test_get_product_invalid_id_format(self, client: AsyncClient):
         """Get product with invalid ID format returns 422."""
-        response = await client.get("/api/v1/products/invalid-id")
+        response = await client.get(_PRODUCTS_URL + "invalid-id")
         
         assert response.status_code == 422  # Validation error
 
@@ -116,130 +230,42 @@ class TestGetProduct:
 class TestCreateProduct:
     """Tests for creating products (admin only)."""
     
-    async def test_create_product_as_admin_success(
-        self, client: AsyncClient, admin_headers
+    @pytest.mark.parametrize(
+        "payload, role, expected_status",
+        [
+            (_FULL_PRODUCT, "admin", 201),
+            # Regular users get UnauthorizedException from get_current_superuser
+            ({**_FULL_PRODUCT, "name": "Unauthorized Product"}, "user", 401),
+            ({**_MIN_PRODUCT, "name": "No Auth Product"}, None, 401),
+            (_MIN_PRODUCT, "admin", 201),
+            ({**_MIN_PRODUCT, "price": -10.00}, "admin", 422),  # Validation error
+            ({**_MIN_PRODUCT, "stock": -5}, "admin", 422),  # Validation error
+        ],
+        ids=["admin-ok", "regular-user", "no-auth", "minimum-fields", "invalid-price", "invalid-stock"],
+    )
+    async def test_create_product(
+        self, client: AsyncClient, admin_headers, auth_headers,
+        payload, role, expected_status
     ):
-        """Create product as admin user succeeds."""
-        product_data = {
-            "name": "New Product",
-            "description": "A brand new product",
-            "price": 49.99,
-            "stock": 25,
-            "category": "Test",
-            "tags": ["new", "featured"]
-        }
+        """Create product succeeds only for admins with a valid payload."""
+        headers = {"admin": admin_headers, "user": auth_headers, None: {}}[role]
         
         response = await client.post(
-            "/api/v1/products/",
-            json=product_data,
-            headers=admin_headers
+            _PRODUCTS_URL,
+            json={**payload},
+            headers=headers
         )
         
-        assert response.status_code == 201
+        assert response.status_code == expected_status
+        if expected_status != 201:
+            return
         data = response.json()
-        assert data["name"] == "New Product"
-        assert data["description"] == "A brand new product"
-        assert data["price"] == 49.99
-        assert data["stock"] == 25
-        assert data["category"] == "Test"
-        assert "new" in data["tags"]
-        assert "featured" in data["tags"]
+        for field, value in payload.items():
+            assert data[field] == (list(value) if isinstance(value, tuple) else value)
+        assert data["stock"] == payload.get("stock", 0)  # Default value
         assert data["is_active"] is True
         assert "id" in data
         assert "created_at" in data
-    
-    async def test_create_product_as_regular_user_returns_403(
-        self, client: AsyncClient, auth_headers
-    ):
-        """Create product as regular user returns 403 forbidden."""
-        product_data = {
-            "name": "Unauthorized Product",
-            "description": "Should not be created",
-            "price": 19.99,
-            "stock": 10
-        }
-        
-        response = await client.post(
-            "/api/v1/products/",
-            json=product_data,
-            headers=auth_headers
-        )
-        
-        # Regular user should not be able to create products
-        assert response.status_code == 401  # UnauthorizedException from get_current_superuser
-    
-    async def test_create_product_without_auth_returns_401(
-        self, client: AsyncClient
-    ):
-        """Create product without authentication returns 401."""
-        product_data = {
-            "name": "No Auth Product",
-            "price": 29.99,
-            "stock": 5
-        }
-        
-        response = await client.post(
-            "/api/v1/products/",
-            json=product_data
-        )
-        
-        assert response.status_code == 401
-    
-    async def test_create_product_with_minimum_fields(
-        self, client: AsyncClient, admin_headers
-    ):
-        """Create product with only required fields succeeds."""
-        product_data = {
-            "name": "Minimal Product",
-            "price": 9.99
-        }
-        
-        response = await client.post(
-            "/api/v1/products/",
-            json=product_data,
-            headers=admin_headers
-        )
-        
-        assert response.status_code == 201
-        data = response.json()
-        assert data["name"] == "Minimal Product"
-        assert data["price"] == 9.99
-        assert data["stock"] == 0  # Default value
-    
-    async def test_create_product_invalid_price(
-        self, client: AsyncClient, admin_headers
-    ):
-        """Create product with invalid price returns validation error."""
-        product_data = {
-            "name": "Invalid Price Product",
-            "price": -10.00  # Negative price
-        }
-        
-        response = await client.post(
-            "/api/v1/products/",
-            json=product_data,
-            headers=admin_headers
-        )
-        
-        assert response.status_code == 422  # Validation error
-    
-    async def test_create_product_invalid_stock(
-        self, client: AsyncClient, admin_headers
-    ):
-        """Create product with negative stock returns validation error."""
-        product_data = {
-            "name": "Invalid Stock Product",
-            "price": 10.00,
-            "stock": -5  # Negative stock
-        }
-        
-        response = await client.post(
-            "/api/v1/products/",
-            json=product_data,
-            headers=admin_headers
-        )
-        
-        assert response.status_code == 422  # Validation error
 
 
 class TestUpdateProduct:
@@ -255,7 +281,7 @@ class TestUpdateProduct:
         }
         
         response = await client.put(
-            f"/api/v1/products/{test_product.id}",
+            _PRODUCTS_URL + str(test_product.id),
             json=update_data
         )
         
@@ -276,7 +302,7 @@ class TestUpdateProduct:
         }
         
         response = await client.put(
-            f"/api/v1/products/{test_product.id}",
+            _PRODUCTS_URL + str(test_product.id),
             json=update_data
         )
         
@@ -285,17 +311,22 @@ class TestUpdateProduct:
         assert data["stock"] == 200
         assert data["price"] == original_price  # Unchanged
     
-    async def test_update_product_not_found(self, client: AsyncClient):
-        """Update non-existent product returns 404."""
-        fake_id = "507f1f77bcf86cd799439011"
-        update_data = {"name": "Does Not Exist"}
+    async def test_update_product_refreshes_updated_at(
+        self, client: AsyncClient, test_product
+    ):
+        """Update product bumps updated_at past created_at."""
+        from datetime import datetime
         
         response = await client.put(
-            f"/api/v1/products/{fake_id}",
-            json=update_data
+            _PRODUCTS_URL + str(test_product.id),
+            json={"stock": 42}
         )
         
-        assert response.status_code == 404
+        assert response.status_code == 200
+        data = response.json()
+        created_at = datetime.fromisoformat(data["created_at"])
+        updated_at = datetime.fromisoformat(data["updated_at"])
+        assert updated_at > created_at
 
 
 class TestDeleteProduct:
@@ -304,21 +335,81 @@ class TestDeleteProduct:
     async def test_delete_product_success(
         self, client: AsyncClient, test_product
     ):
-        """Delete product succeeds."""
-        response = await client.delete(f"/api/v1/products/{test_product.id}")
+        """Delete product succeeds and names the deleted product."""
+        response = await client.delete(_PRODUCTS_URL + str(test_product.id))
         
         assert response.status_code == 200
         data = response.json()
         assert "message" in data
+        assert data["deleted"] is True
+        assert data["id"] == str(test_product.id)
+    
+    async def test_delete_is_persistent(
+        self, client: AsyncClient, test_product
+    ):
+        """A deleted product can no longer be fetched, even after a cached read."""
+        await client.get(_PRODUCTS_URL + str(test_product.id))
+        await client.delete(_PRODUCTS_URL + str(test_product.id))
         
-        # Verify product no longer exists
-        get_response = await client.get(f"/api/v1/products/{test_product.id}")
+        get_response = await client.get(_PRODUCTS_URL + str(test_product.id))
         assert get_response.status_code == 404
+
+
+class TestMissingProduct:
+    """Tests for every endpoint that addresses a product that does not exist."""
     
-    async def test_delete_product_not_found(self, client: AsyncClient):
-        """Delete non-existent product returns 404."""
-        fake_id = "507f1f77bcf86cd799439011"
-        
-        response = await client.delete(f"/api/v1/products/{fake_id}")
+    @pytest.mark.parametrize(
+        "method, kwargs",
+        [
+            ("get", {}),
+            ("put", {"json": {"name": "Does Not Exist"}}),
+            ("delete", {}),
+        ],
+        ids=["get", "update", "delete"],
+    )
+    async def test_missing_product_returns_404(
+        self, client: AsyncClient, method, kwargs
+    ):
+        """Reading, updating or deleting a non-existent product returns 404."""
+        response = await client.request(method, _PRODUCTS_URL + _MISSING_ID, **kwargs)
         
         assert response.status_code == 404
+
+
+class TestProductSearchFilter:
+    """Tests for trying the $text index first and falling back to the name prefix."""
+    
+    @pytest.fixture
+    def page_queries(self, monkeypatch, test_products):
+        """Turn text search on and record each page query; $text (which mongomock lacks) is stubbed."""
+        recorded = SimpleNamespace(queries=[], text_rows=[])
+        real_query_page = product_router.query_products_page
+        
+        async def query_page(collection, query, skip, size, no_total, ranked=False):
+            recorded.queries.append(query)
+            if "$text" in query:
+                return list(recorded.text_rows), len(recorded.text_rows)
+            return await real_query_page(collection, query, skip, size, no_total, ranked)
+        
+        monkeypatch.setattr(get_settings(), "mongodb_text_search", True)
+        monkeypatch.setattr(product_router, "query_products_page", query_page)
+        return recorded
+    
+    async def test_text_match_is_served_in_one_query(self, client: AsyncClient, page_queries):
+        """When whole words match, the $text query alone answers the search."""
+        page_queries.text_rows.append(await Product.get_motor_collection().find_one({"name": "Product 3"}))
+        
+        response = await client.get(_PRODUCTS_URL, params={"search": "product"})
+        
+        assert [p["name"] for p in response.json()["products"]] == ["Product 3"]
+        assert page_queries.queries == [{"$text": {"$search": "product"}}]
+    
+    async def test_falls_back_to_name_prefix_when_no_word_matches(self, client: AsyncClient, page_queries):
+        """A partial word matches nothing in $text, so the lowercased, escaped name prefix runs."""
+        response = await client.get(_PRODUCTS_URL, params={"search": "Product 1"})
+        
+        assert [p["name"] for p in response.json()["products"]] == ["Product 1"]
+        assert page_queries.queries == [
+            {"$text": {"$search": "Product 1"}},
+            {"name_lower": {"$regex": "^product\\ 1"}},
+        ]